@@ -7,13 +7,20 @@ usage: censusACS.py [-h] [-c config_json_file]
 
 import pandas as pd
 import numpy as np
-import requests
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import httpx
 import json
 import os
+import pickle
 import sys
 import zipfile
 import argparse
+import contextlib
+import shutil
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
 states_fips = ['al', 'ak', 'az', 'ar', 'ca', 'co', 'ct', 'dc', 'de', 'fl', 'ga',
           'hi', 'id', 'il', 'in', 'ia', 'ks', 'ky', 'la', 'me', 'md', 'ma',
@@ -21,6 +28,13 @@ states_fips = ['al', 'ak', 'az', 'ar', 'ca', 'co', 'ct', 'dc', 'de', 'fl', 'ga',
           'nc', 'nd', 'oh', 'ok', 'or', 'pa', 'ri', 'sc', 'sd', 'tn', 'tx',
           'ut', 'vt', 'va', 'wa', 'wv', 'wi', 'wy', 'us', 'pr']
 
+# Read-only data shared with worker processes; populated by init_worker
+shared = {}
+
+# Format version of the pickled Appendix A and templates caches;
+# bump whenever get_appendix or get_templates output changes
+cache_version = 1
+
 
 
 def stderr_print(*args, **kwargs):
@@ -102,43 +116,105 @@ def get_config(config=None):
     }
 
 
-def request_file(url):
+def get_client():
     """
-    requests.get with status check
+    Return an httpx.Client that multiplexes downloads over pooled HTTP/2
+    connections, retrying failed connection attempts.
     """
+    transport = httpx.HTTPTransport(http2=True, retries=3,
+                                    limits=httpx.Limits(max_connections=8,
+                                                        max_keepalive_connections=8))
+    return httpx.Client(transport=transport, timeout=30)
+
+
+def download_file(client, url, pathname):
+    """
+    Download url to pathname, streaming the body to disk in 1 MiB chunks.
+    """
+    print(f'Requesting file {url}')
+    # Write to a temporary name so a failed download leaves no partial file
+    partial_pathname = pathname + '.part'
     try:
-        response = requests.get(url, timeout=3.333)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
+        with client.stream('GET', url) as response:
+            response.raise_for_status()
+            with open(partial_pathname, 'wb') as w:
+                for chunk in response.iter_bytes(1 << 20):
+                    w.write(chunk)
+        os.replace(partial_pathname, pathname)
+        print(f'File {pathname} downloaded successfully')
+    except httpx.HTTPError as e:
         stderr_print(f'Error: Download from {url} failed. Reason: {e}')
-        return None
+    except OSError as e:
+        stderr_print(f'Error {e}: File write on {pathname} failed')
 
 
-def read_from_csv(file, names):
+def read_from_csv(file, names, usecols=None, chunksize=None):
     """
     Customized call to pandas.read_csv for reading header-less summary files.
+    Only the columns named in usecols are parsed, if given; with chunksize,
+    return an iterator of DataFrames of that many rows.
     """
-    return pd.read_csv(file, encoding='ISO-8859-1', names=names,
-                       header=None, na_values=['.', -1], dtype=str)
+    return pd.read_csv(file, encoding='ISO-8859-1', names=names, usecols=usecols,
+                       header=None, na_values=['.', -1], dtype=str, chunksize=chunksize)
 
 
-def read_summary_file(file, names):
+def read_summary_file(file, names, dtypes, usecols=None):
     """
-    Read summary estimates/margins file and return a massaged DataFrame
-    ready for data extraction.
+    Read summary estimates/margins file with the pyarrow CSV reader and
+    return a massaged DataFrame ready for data extraction. Columns are
+    typed per the dtypes map; only the columns named in usecols are parsed,
+    if given. Reader threads are off since each worker process reads its
+    own state; raises pyarrow.ArrowInvalid on malformed rows or values.
     """
-    df = read_from_csv(file, names=names)
+    column_types = {name: pa.from_numpy_dtype(np.dtype(dtype))
+                    for name, dtype in dtypes.items()}
+    table = pa_csv.read_csv(
+        file,
+        read_options=pa_csv.ReadOptions(column_names=list(names), block_size=8 << 20,
+                                        use_threads=False),
+        parse_options=pa_csv.ParseOptions(delimiter=','),
+        convert_options=pa_csv.ConvertOptions(null_values=['', '.', '-1'],
+                                              column_types=column_types,
+                                              include_columns=usecols))
+    df = table.to_pandas()
     return df.rename(columns={'SEQUENCE': 'seq'})
 
 
-def get_appendix_data(df, table):
+def get_appendix(pathname):
+    """
+    Read the ACS 5-year Appendix A workbook at pathname; return a DataFrame
+    of table names, titles, sequence numbers, and start/end record numbers.
     """
-    Given Appendix A DataFrame df and table name,
+    with open(pathname, 'rb') as r:
+        appx_A = pd.read_excel(r, converters={'Summary File Sequence Number': convert_seq_int_to_str}, engine='openpyxl')
+        appx_A.columns = ['name', 'title', 'restr', 'seq', 'start_end', 'topics', 'universe']
+        try:
+            # Split 'start-end' strings into [start, '-', end] columns
+            parts = np.char.partition(appx_A['start_end'].to_numpy().astype('U'), '-')
+            appx_A['start'] = parts[:, 0].astype(np.int32)
+            appx_A['end'] = parts[:, 2].astype(np.int32)
+        except ValueError as e:
+            stderr_print(f'{e}')
+            stderr_print(f'File {pathname} is corrupt or has invalid format')
+            raise SystemExit(f'Exiting {__file__}')
+    return appx_A
+
+
+def get_appendix_index(df):
+    """
+    Given Appendix A DataFrame df, return a dictionary mapping each
+    table name to its Sequence, Start, and End numbers as lists.
+    """
+    grouped = df.groupby('name', sort=False)[['seq', 'start', 'end']].agg(list)
+    return dict(zip(grouped.index, zip(grouped['seq'], grouped['start'], grouped['end'])))
+
+
+def get_appendix_data(appx_index, table):
+    """
+    Given the Appendix A index from get_appendix_index and table name,
     return Sequence, Start, and End numbers as lists.
     """
-    df = df[df['name'] == table]
-    return df['seq'].tolist(), df['start'].tolist(), df['end'].tolist()
+    return appx_index.get(table, ([], [], []))
 
 
 def get_by_summary_level(df, summary_level):
@@ -155,13 +231,39 @@ def convert_seq_int_to_str(seqint):
     """
     return(f'{seqint:04}')
 
+def load_cached(pathname, reader):
+    """
+    Return reader(pathname), cached as a pickle file next to pathname.
+    The cache is used while it is newer than the file at pathname and was
+    written with the current cache_version, so the workbooks are only
+    parsed again when they or the cached format change.
+    """
+    cache_pathname = pathname + '.pkl'
+    if (os.path.exists(cache_pathname)
+            and os.path.getmtime(cache_pathname) > os.path.getmtime(pathname)):
+        with open(cache_pathname, 'rb') as r:
+            cached = pickle.load(r)
+        if isinstance(cached, dict) and cached.get('version') == cache_version:
+            return cached['data']
+    data = reader(pathname)
+    # Write to a temporary name so an interrupted run leaves no partial cache
+    partial_pathname = cache_pathname + '.part'
+    with open(partial_pathname, 'wb') as w:
+        pickle.dump({'version': cache_version, 'data': data}, w,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial_pathname, cache_pathname)
+    return data
+
+
 def get_templates(templates_zip_archive):
     """
     Unzip the Summary File Templates archive file; generate and
     return a dictionary mapping 'geo' and seq # to corresponding
-    file column name lists.
+    file column name lists, and a companion dictionary mapping
+    seq # to column dtypes.
     """
     templates = dict()
+    dtypes = dict()
     with zipfile.ZipFile(templates_zip_archive) as z:
         # Loop through all files in archive namelist
         for name in z.namelist():
@@ -181,17 +283,39 @@ def get_templates(templates_zip_archive):
                 df = pd.read_excel(f, engine='openpyxl')
                 # Extract column names from data row 0
                 templates[key] = df.columns
-    return templates
+            if key != 'geo':
+                # The record identification columns FILEID through SEQUENCE are
+                # text, LOGRECNO is the integer join key for the geo file, and
+                # all remaining columns are numeric estimates
+                dtypes[key] = {name: np.str_ for name in df.columns[:5]}
+                dtypes[key]['LOGRECNO'] = np.int32
+                dtypes[key].update({name: np.float64 for name in df.columns[6:]})
+    return templates, dtypes
 
 
-def get_logical_records(fp, names, summary_level):
+def read_geography(fp, names, summary_levels):
+    """
+    Given a CSV geo file object fp, column-names list names, and a list
+    of geo summary levels, return a DataFrame of the GEO IDs, Logical
+    Record Numbers and summary levels from the geo file for rows at those
+    levels. Only those three columns are parsed, in chunks, so only
+    matching rows are held in memory; LOGRECNO is converted to int32 to
+    match the estimates files.
     """
-    Given a CSV geo file object fp, column-names list names,
-    and geo summary level value, return a DataFrame of GEO IDS
-    and Logical Record Numbers from the geo file, filtered by
-    the geographic summary level.
+    chunks = read_from_csv(fp, names=names, usecols=['GEOID', 'LOGRECNO', 'SUMLEVEL'],
+                           chunksize=200_000)
+    gdf = pd.concat([chunk[chunk['SUMLEVEL'].isin(summary_levels)] for chunk in chunks],
+                    ignore_index=True)
+    gdf['LOGRECNO'] = gdf['LOGRECNO'].astype(np.int32)
+    return gdf
+
+
+def get_logical_records(gdf, summary_level):
+    """
+    Given a DataFrame gdf from read_geography and geo summary level
+    value, return a DataFrame of GEO IDS and Logical Record Numbers,
+    filtered by the geographic summary level.
     """
-    gdf = read_from_csv(fp, names=names)
     summary_geo = get_by_summary_level(gdf, summary_level)
     return summary_geo[['GEOID', 'LOGRECNO']]
 
@@ -201,6 +325,230 @@ def progress_report(fraction):
     print(f'\rProgress: {100*fraction:.0f}% ', end='')
 
 
+def init_worker(appendix_index, file_templates, file_dtypes):
+    """
+    Worker process initializer; store the Appendix A index and the
+    templates and dtypes dictionaries once per process instead of once per task.
+    """
+    shared['appx_index'] = appendix_index
+    shared['templates'] = file_templates
+    shared['dtypes'] = file_dtypes
+
+
+def to_arrow_table(geoids, columns, data):
+    """
+    Given GEO IDs, column names and a 2-D float array of estimates, return
+    a pyarrow Table with a leading GEOID column. Columns holding only whole
+    numbers become int64, so large counts and aggregates are written with
+    all their digits rather than in the float formatter's exponent notation.
+    """
+    missing = np.isnan(data)
+    filled = np.where(missing, 0, data)
+    # Whole-number columns, ignoring missing values
+    integral = (filled == np.floor(filled)).all(axis=0)
+    arrays = [pa.array(geoids, type=pa.string())]
+    for i, name in enumerate(columns):
+        if integral[i]:
+            arrays.append(pa.array(filled[:, i].astype(np.int64), mask=missing[:, i]))
+        else:
+            arrays.append(pa.array(data[:, i], mask=missing[:, i]))
+    return pa.Table.from_arrays(arrays, names=['GEOID'] + [str(name) for name in columns])
+
+
+def build_tables(state, archives, level_records, all_tables, seq_cols, outdir):
+    """
+    Build and save each table in all_tables for every summary level.
+    archives maps summary file suffix to the open summary file's pathname,
+    ZipFile, estimates file names keyed by sequence number and geo
+    DataFrame. level_records lists (summary level, summary
+    file suffix, GEO IDs keyed by Logical Record Number) in output order.
+    Return a dictionary of the number of tables saved per summary level.
+    """
+    appx_index = shared['appx_index']
+    templates = shared['templates']
+    dtypes = shared['dtypes']
+    # Index of the last table using each sequence file; its parse is dropped after that table
+    last_use = {}
+    for n, table in enumerate(all_tables):
+        for seq in get_appendix_data(appx_index, table)[0]:
+            last_use[seq] = n
+    # Estimates indexed by LOGRECNO, parsed once per summary file and sequence file
+    seq_cache = {}
+    built = {summary_level: 0 for summary_level, _, _ in level_records}
+    # Process all tables
+    for n, table in enumerate(all_tables):
+        # For this table, get file sequence numbers, start/end record numbers (as strings)
+        seqs, starts, ends = get_appendix_data(appx_index, table)
+        frames = []
+        for summary_level, summary_file_suffix, wanted in level_records:
+            pathname, z, efiles, gdf = archives[summary_file_suffix]
+            sequence_data = []
+            for seq, start, end in zip(seqs, starts, ends):
+                # Get summary file based on sequence number
+                template = templates[seq]
+                if (summary_file_suffix, seq) not in seq_cache:
+                    usecols = ['LOGRECNO'] + [template[c] for c in sorted(seq_cols[seq])]
+                    try:
+                        efile = efiles[seq]
+                        with z.open(efile) as e:
+                            edf = read_summary_file(e, names=template, dtypes=dtypes[seq],
+                                                    usecols=usecols)
+                        seq_cache[summary_file_suffix, seq] = edf.set_index('LOGRECNO')
+                    except (OSError, pa.ArrowInvalid) as e:
+                        stderr_print(f'Estimates file {efile} error for {state}')
+                        stderr_print(f'{e}')
+                        # Remember the failure so later tables skip this file too
+                        seq_cache[summary_file_suffix, seq] = None
+                if seq_cache[summary_file_suffix, seq] is None:
+                    # Skip this table rather than save it with missing columns
+                    sequence_data = []
+                    break
+                # Keep only data columns, aligned to this summary level's logical records
+                edf = seq_cache[summary_file_suffix, seq][template[start - 1:end]]
+                sequence_data.append(edf.reindex(wanted.index))
+
+            # Guard rail against file errors above
+            if not sequence_data:
+                continue
+
+            # Stack the data column-wise; all frames share the same LOGRECNO index
+            data = np.hstack([d.to_numpy() for d in sequence_data])
+
+            # Drop tables with no estimates at this summary level
+            if not np.isfinite(data).any():
+                continue
+
+            # Label rows by GEO ID
+            columns = np.concatenate([d.columns.values for d in sequence_data])
+            frames.append(to_arrow_table(wanted.values, columns, data))
+            built[summary_level] += 1
+
+        # Drop parsed sequence files that no later table uses
+        for seq in seqs:
+            if last_use[seq] == n:
+                for summary_file_suffix in archives:
+                    seq_cache.pop((summary_file_suffix, seq), None)
+
+        if not frames:
+            continue
+
+        # Save as CSV; each worker writes its own file to avoid contention
+        table_csv_pathname = os.path.join(outdir, state + table + '.csv')
+        with open(table_csv_pathname, 'ab', buffering=1 << 20) as f:
+            for frame in frames:
+                write_options = pa_csv.WriteOptions(include_header=f.tell() == 0,
+                                                    batch_size=64 * 1024)
+                pa_csv.write_csv(frame, f, write_options=write_options)
+
+    return built
+
+
+def process_state(state, summary_levels, all_tables, sourcedir, outdir, suffixes):
+    """
+    Build all requested tables for one state at each summary level, saving
+    one CSV per table to outdir as state + table + '.csv'.
+    Return the state and elapsed time in seconds.
+    """
+    starttime = time.time()
+    appx_index = shared['appx_index']
+    templates = shared['templates']
+    summary_file_tracts_suffix, summary_file_not_tracts_suffix = suffixes
+    print(f'Building tables for {state}')
+
+    # Map each summary level to the summary file that holds it
+    suffix_by_level = {}
+    levels_by_suffix = {}
+    for summary_level in summary_levels:
+        if summary_level == '140' or summary_level == '150':
+            summary_file_suffix = summary_file_tracts_suffix
+        else:
+            summary_file_suffix = summary_file_not_tracts_suffix
+        suffix_by_level[summary_level] = summary_file_suffix
+        levels_by_suffix.setdefault(summary_file_suffix, []).append(summary_level)
+
+    # Collect the column positions needed from each sequence file
+    seq_cols = {}
+    for table in all_tables:
+        for seq, start, end in zip(*get_appendix_data(appx_index, table)):
+            seq_cols.setdefault(seq, set()).update(range(start - 1, end))
+
+    with contextlib.ExitStack() as stack:
+        # Unzip and open each summary file once, reading its Geography file
+        # once for all of the summary levels it holds
+        archives = {}
+        for summary_file_suffix, levels in levels_by_suffix.items():
+            pathname = os.path.join(sourcedir, state + summary_file_suffix)
+            try:
+                z = stack.enter_context(zipfile.ZipFile(pathname))
+                # List the archive once for the Geography and Estimate file names
+                all_names = z.namelist()
+            except OSError as e:
+                stderr_print(f'Summary file error for {pathname}')
+                stderr_print(f'{e}')
+                continue
+
+            # Get Geography CSV file name
+            geofile = next(f for f in all_names if f.startswith('g') and f.endswith('csv'))
+            try:
+                with z.open(geofile) as g:
+                    gdf = read_geography(g, templates['geo'], levels)
+            except OSError as e:
+                stderr_print(f'Geofile error for {state}')
+                stderr_print(f'{e}')
+                continue
+
+            # Get Estimate file names
+            # Pull sequence number from file name positions 8-11; use as dict key
+            efiles = {f[8:12]: f for f in all_names if f.startswith('e')}
+            archives[summary_file_suffix] = (pathname, z, efiles, gdf)
+
+        # Get Geo IDs keyed by Logical Record Number for each Summary Level, in the order given
+        level_records = []
+        for summary_level in summary_levels:
+            summary_file_suffix = suffix_by_level[summary_level]
+            if summary_file_suffix not in archives:
+                continue
+            gdf = archives[summary_file_suffix][3]
+            logi_recs = get_logical_records(gdf, summary_level)
+            level_records.append((summary_level, summary_file_suffix,
+                                  logi_recs.set_index('LOGRECNO')['GEOID']))
+
+        try:
+            built = build_tables(state, archives, level_records, all_tables, seq_cols, outdir)
+        except OSError as e:
+            stderr_print(f'Table build error for {state}')
+            stderr_print(f'{e}')
+        else:
+            for summary_level in built:
+                print(f'\n{state} level {summary_level} tables: saved {built[summary_level]}, '
+                      f'dropped {len(all_tables) - built[summary_level]} empty')
+
+    return state, time.time() - starttime
+
+
+def merge_state_tables(outdir, states, all_tables):
+    """
+    Append each state's table CSV, in states order, to a single
+    table + '.csv' in outdir, keeping only the first header row.
+    The national file is only created for tables with state data.
+    Per-state files are removed once merged.
+    """
+    for table in all_tables:
+        state_csv_pathnames = [os.path.join(outdir, state + table + '.csv') for state in states]
+        state_csv_pathnames = [p for p in state_csv_pathnames if os.path.exists(p)]
+        if not state_csv_pathnames:
+            continue
+        table_csv_pathname = os.path.join(outdir, table + '.csv')
+        with open(table_csv_pathname, 'ab', buffering=1 << 20) as w:
+            for state_csv_pathname in state_csv_pathnames:
+                with open(state_csv_pathname, 'rb') as r:
+                    # Skip the header row unless this is the first write
+                    if w.tell() != 0:
+                        r.readline()
+                    shutil.copyfileobj(r, w)
+                os.remove(state_csv_pathname)
+
+
 def main(config=None):
     # Read config.json or default variables
     cfg = get_config(config)
@@ -243,36 +591,28 @@ def main(config=None):
             acs_base_url + '/data/' + templates_file,
             ] + state_tracts_urls + state_not_tracts_urls
 
-    # Download files, as necessary
+    # Download files, as necessary, over a shared pool of connections
+    downloads = []
+    # List the data directory once rather than checking each file
+    with os.scandir(sourcedir) as entries:
+        have = {entry.name for entry in entries}
     for url in urls:
         basename, filename = os.path.split(url)
-        p = os.path.join(sourcedir, filename)
-        if not os.path.exists(p):
-            print(f'Requesting file {url}')
-            response = request_file(url)
-            if response:
-                try:
-                    with open(p, 'wb') as w:
-                        w.write(response.content)
-                        print(f'File {p} downloaded successfully')
-                except OSError as e:
-                    stderr_print(f'Error {e}: File write on {p} failed')
+        if filename not in have:
+            downloads.append((url, os.path.join(sourcedir, filename)))
+    if downloads:
+        # Order by host so requests to the same origin share connections
+        downloads.sort(key=lambda d: urlsplit(d[0]).netloc)
+        with get_client() as client, ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda d: download_file(client, *d), downloads))
 
     # Read ACS 5-year Appendix A for Table sequence numbers, start/end records
     pathname = os.path.join(sourcedir, appendix_file)
-    with open(pathname, 'rb') as r:
-        appx_A = pd.read_excel(r, converters={'Summary File Sequence Number': convert_seq_int_to_str}, engine='openpyxl')
-        appx_A.columns = ['name', 'title', 'restr', 'seq', 'start_end', 'topics', 'universe']
-        try:
-            appx_A[['start', 'end']] = appx_A['start_end'].str.split('-', 1, expand=True)
-            appx_A['start'] = pd.to_numeric(appx_A['start'])
-            appx_A['end'] = pd.to_numeric(appx_A['end'])
-        except ValueError as e:
-            stderr_print(f'{e}')
-            stderr_print(f'File {pathname} is corrupt or has invalid format')
-            raise SystemExit(f'Exiting {__file__}')
+    appx_A = load_cached(pathname, get_appendix)
+
+    # Index Appendix A by table name for lookups while building tables
+    appx_index = get_appendix_index(appx_A)
 
-    
     # Create Tables list
     tables = appx_A.drop(['restr', 'seq', 'start_end', 'start', 'end', 'topics', 'universe'], axis=1)
     pathname = os.path.join(outdir, 'ACS All Tables.csv')
@@ -286,99 +626,23 @@ def main(config=None):
 
     # Create the templates dictionary
     pathname2 = os.path.join(sourcedir, templates_file)
-    templates = get_templates(pathname2)
-
-    # For each state and table name, generate output table
-    i = 0
-    for state in states:
-        starttime = time.time()
-        print(f'Building tables for {state}')
-        # Unzip and open the summary files
-        for summary_level in summary_levels:
-            
-            if summary_level == '140' or summary_level == '150':
-                summary_file_suffix = summary_file_tracts_suffix
-            else:
-                summary_file_suffix = summary_file_not_tracts_suffix
-            pathname = os.path.join(sourcedir, state + summary_file_suffix)
-
-            try:
-                with zipfile.ZipFile(pathname) as z:
-                    # Get Geography CSV file name
-                    geofile = [f for f in z.namelist()
-                            if f.startswith('g') and f.endswith('csv')
-                            ][0]
-                    # Open and read the Geography file
-                    try:
-                        with z.open(geofile) as g:
-                            # Get Geo IDs and Logical Record Numbers for this Summary Level
-                            logi_recs = get_logical_records(g, templates['geo'], summary_level)
-                    except OSError as e:
-                        stderr_print(f'Geofile error for {state}')
-                        stderr_print(f'{e}')
-                        continue
-
-                    # Get Estimate file names
-                    e = [f for f in z.namelist() if f.startswith('e')]
-                    # Pull sequence number from file name positions 8-11; use as dict key
-                    efiles = {f[8:12]: f for f in e}
-                    built = 0
-                    # Process all tables
-                    for n, table in enumerate(all_tables):
-                        sequence_data = []
-                        # For this table, get file sequence numbers, start/end record numbers (as strings)
-                        seqs, starts, ends = get_appendix_data(appx_A, table)
-                        for seq, start, end in zip(seqs, starts, ends):
-                            # Get summary file based on sequence number
-                            template = templates[seq]
-                            try:
-                                efile = efiles[seq]
-                                with z.open(efile) as e:
-                                    edf = read_summary_file(e, names=template)
-                            except OSError as e:
-                                stderr_print(f'Estimates file {efile} error for {state}')
-                                stderr_print(f'{e}')
-                                break
-
-                            # Merge the estimates with the logical records
-                            edf = edf.merge(logi_recs).set_index('GEOID')
-                            # Keep only data columns
-                            use_col_nums = list(range(start - 1, end))
-                            edf = edf.iloc[:, use_col_nums]
-                            # Save DataFrame to list
-                            sequence_data.append(edf)
-
-                        # Guard rail against file errors above
-                        if sequence_data:
-
-                            # Concatenate multiple data frames column-wise
-                            df = pd.concat(sequence_data, axis=1)
-
-                            # Reset 'GEOID' from index to column
-                            df.reset_index(inplace=True)
-
-                            # Save as CSV
-                            if len(states) == 53:
-                                table_csv_pathname = os.path.join(outdir, table + '.csv')
-                            else:
-                                table_csv_pathname = os.path.join(outdir, state + table + '.csv')
-                            with open(table_csv_pathname, 'a') as f:
-                                df.to_csv(f, header=f.tell()==0, index=False)
-                            built += 1
-
-                        # Print progress percentage
-                        #progress_report(n / len(all_tables))
-
-                    print(f'\n{state} tables: saved {built}, dropped {n + 1 - built} empty')
-
-            except OSError as e:
-                stderr_print(f'Summary file error for {pathname}')
-                stderr_print(f'{e}')
-                continue
-        
-        progress_report(i / len(states))
-        print(f'finished {state} in {time.time() - starttime}')   
-        i+=1
+    templates, dtypes = load_cached(pathname2, get_templates)
+
+    # For each state, generate output tables in a pool of worker processes
+    suffixes = (summary_file_tracts_suffix, summary_file_not_tracts_suffix)
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker,
+                             initargs=(appx_index, templates, dtypes)) as executor:
+        futures = [executor.submit(process_state, state, summary_levels, all_tables,
+                                   sourcedir, outdir, suffixes)
+                   for state in states]
+        for i, future in enumerate(as_completed(futures), start=1):
+            state, elapsed = future.result()
+            progress_report(i / len(states))
+            print(f'finished {state} in {elapsed}')
+
+    # Merge per-state tables into one national CSV per table
+    if len(states) == 53:
+        merge_state_tables(outdir, states, all_tables)
 
 
 